@@ -3,7 +3,9 @@
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 
 import asyncio
+import contextlib
 import logging
+import os
 from collections.abc import Awaitable, Callable
 from contextlib import AbstractAsyncContextManager
 from pathlib import Path
@@ -18,7 +20,6 @@ from watchdog.events import (
     FileSystemMovedEvent,
 )
 from watchdog.observers import Observer
-from watchdog.utils.event_debouncer import EventDebouncer
 
 from questionpy_common.constants import DIST_DIR
 from questionpy_sdk.package.builder import DirPackageBuilder
@@ -34,6 +35,10 @@ log = logging.getLogger("questionpy-sdk:watcher")
 
 _DEBOUNCE_INTERVAL = 0.5  # seconds
 
+# Editor swap files, bytecode and VCS/virtualenv internals never affect the built package.
+_IGNORED_SUFFIXES = (".pyc", ".swp", ".swx", "~")
+_IGNORED_SEGMENTS = tuple(f"{os.sep}{name}{os.sep}" for name in ("__pycache__", ".git", ".venv"))
+
 
 class _EventHandler(FileSystemEventHandler):
     """Debounces events for watchdog file monitoring, ignoring events in the `dist` directory."""
@@ -45,24 +50,32 @@ class _EventHandler(FileSystemEventHandler):
         self._notify_callback = notify_callback
         self._watch_path = watch_path
 
-        self._event_debouncer = EventDebouncer(_DEBOUNCE_INTERVAL, self._on_file_changes)
+        self._events: asyncio.Queue[FileSystemEvent] = asyncio.Queue()
+        self._debounce_task: asyncio.Task | None = None
 
     def start(self) -> None:
-        self._event_debouncer.start()
+        self._debounce_task = self._loop.create_task(self._debounce())
 
-    def stop(self) -> None:
-        if self._event_debouncer.is_alive():
-            self._event_debouncer.stop()
-            self._event_debouncer.join()
+    async def stop(self) -> None:
+        if self._debounce_task:
+            self._debounce_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._debounce_task
+            self._debounce_task = None
 
     def dispatch(self, event: FileSystemEvent) -> None:
-        # filter events and debounce
+        # filter events and hand them over to the event loop in the main thread for debouncing
         if not self._ignore_event(event):
-            self._event_debouncer.handle_event(event)
+            self._loop.call_soon_threadsafe(self._events.put_nowait, event)
 
-    def _on_file_changes(self, events: list[FileSystemEvent]) -> None:
-        # skip synchronization hassle by delegating this to the event loop in the main thread
-        asyncio.run_coroutine_threadsafe(self._notify_callback(), self._loop)
+    async def _debounce(self) -> None:
+        while True:
+            await self._events.get()
+            # wait until no further events arrived for the debounce interval
+            with contextlib.suppress(TimeoutError):
+                while True:
+                    await asyncio.wait_for(self._events.get(), _DEBOUNCE_INTERVAL)
+            await self._notify_callback()
 
     def _ignore_event(self, event: FileSystemEvent) -> bool:
         """Ignores events that should not trigger a rebuild.
@@ -76,8 +89,13 @@ class _EventHandler(FileSystemEventHandler):
         if isinstance(event, FileOpenedEvent | FileClosedEvent):
             return True
 
+        relevant_path = os.fsdecode(event.dest_path if isinstance(event, FileSystemMovedEvent) else event.src_path)
+
+        # cheap string checks before any path work
+        if relevant_path.endswith(_IGNORED_SUFFIXES) or any(seg in relevant_path for seg in _IGNORED_SEGMENTS):
+            return True
+
         # ignore events events in `dist` dir
-        relevant_path = event.dest_path if isinstance(event, FileSystemMovedEvent) else event.src_path
         try:
             return Path(relevant_path).relative_to(self._watch_path).parts[0] == DIST_DIR
         except IndexError:
@@ -111,10 +129,16 @@ class Watcher(AbstractAsyncContextManager):
     async def __aexit__(
         self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
     ) -> None:
+        # Joining the watchdog thread blocks, so it is done in a worker thread to keep the event loop responsive.
+        await asyncio.to_thread(self._stop_observer)
+        await self._event_handler.stop()
+        await self._webserver.stop_server()
+
+    def _stop_observer(self) -> None:
+        """Stops the file system observer, blocking until its thread has finished."""
         if self._observer.is_alive():
             self._observer.stop()
-        self._event_handler.stop()
-        await self._webserver.stop_server()
+            self._observer.join()
 
     def _schedule(self) -> None:
         if self._watch is None:
@@ -153,13 +177,6 @@ class Watcher(AbstractAsyncContextManager):
     async def _rebuild_and_restart(self) -> None:
         log.info("File changes detected. Rebuilding package...")
 
-        # Stop webserver.
-        try:
-            await self._webserver.stop_server()
-        except Exception:
-            log.exception("Failed to stop web server. The exception was:")
-            raise  # Should not happen, thus we're propagating.
-
         # Build package.
         try:
             package_source = PackageSource(self._source_path)
@@ -167,10 +184,15 @@ class Watcher(AbstractAsyncContextManager):
                 builder.write_package()
         except (PackageBuildError, PackageSourceValidationError):
             log.exception("Failed to build package. The exception was:")
+            # The dist directory is cleared before building, so the running server must not serve it anymore. It is
+            # started again on the next change.
+            await self._webserver.stop_server()
             return
 
-        # Start server.
+        # Reload package, keeping the web server running.
         try:
-            await self._webserver.start_server()
+            await self._webserver.reload_package()
         except Exception:
-            log.exception("Failed to start web server. The exception was:")
+            log.exception("Failed to reload package. The exception was:")
+            # Start from scratch on the next change.
+            await self._webserver.stop_server()
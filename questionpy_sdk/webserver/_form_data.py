@@ -3,8 +3,21 @@
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 
 import operator
+import re
 from typing import Any
 
+_REFERENCE_SEPARATOR = re.compile(r"\]?\[")
+
+
+def _split_reference(reference: str) -> list[str]:
+    """Splits a form element reference like `general[my_repetition][1][role]` into its parts.
+
+    Examples:
+        >>> _split_reference("general[my_repetition][1][role]")
+        ['general', 'my_repetition', '1', 'role']
+    """
+    return _REFERENCE_SEPARATOR.split(reference.rstrip("]"))
+
 
 def _unflatten(flat_form_data: dict[str, str]) -> dict[str, Any]:
     """Splits the keys of a dictionary to form a new nested dictionary.
@@ -23,7 +36,7 @@ def _unflatten(flat_form_data: dict[str, str]) -> dict[str, Any]:
     """
     unflattened_dict: dict[str, Any] = {}
     for flat_key, value in flat_form_data.items():
-        key_path = flat_key.replace("]", "").split("[")
+        key_path = _split_reference(flat_key)
         current_dict = unflattened_dict
         for key_part in key_path[:-1]:
             current_dict = current_dict.setdefault(key_part, {})
@@ -77,7 +90,7 @@ def parse_form_data(form_data: dict) -> dict:
 
 def get_nested_form_data(form_data: dict[str, Any], reference: str) -> object:
     current_element = form_data
-    parts = reference.replace("]", "").split("[")
+    parts = _split_reference(reference)
 
     ref = parts.pop(0)
     if ref != "general":
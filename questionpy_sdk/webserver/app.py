@@ -2,22 +2,32 @@
 #  The QuestionPy SDK is free software released under terms of the MIT license. See LICENSE.md.
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 import asyncio
+import hashlib
 import logging
+import mimetypes
+import os
 import traceback
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable, Mapping
+from contextlib import asynccontextmanager
 from enum import StrEnum
 from functools import cached_property
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, TypeVar
 
 import aiohttp_jinja2
 from aiohttp import web
 from aiohttp.typedefs import Handler
-from jinja2 import PackageLoader
+from jinja2 import FileSystemBytecodeCache, PackageLoader, Template
 
 from questionpy_common.api.qtype import InvalidQuestionStateError
-from questionpy_common.constants import MiB
+from questionpy_common.environment import RequestUser
 from questionpy_common.manifest import Manifest
-from questionpy_server import WorkerPool
+from questionpy_server.worker.exception import (
+    WorkerCPUTimeLimitExceededError,
+    WorkerNotRunningError,
+    WorkerRealTimeLimitExceededError,
+    WorkerStartError,
+)
 from questionpy_server.worker.impl.thread import ThreadWorker
 from questionpy_server.worker.runtime.package_location import PackageLocation
 
@@ -26,12 +36,40 @@ if TYPE_CHECKING:
 
 log = logging.getLogger("questionpy-sdk:web-server")
 
+_T = TypeVar("_T")
+
+_WORKER_STOP_TIMEOUT = 10  # seconds
+
+# Failures after which a worker might be left in an inconsistent state. Errors raised by the package itself, e.g. for
+# an invalid options form, leave the worker usable.
+_WORKER_FAILURES = (
+    asyncio.CancelledError,
+    WorkerCPUTimeLimitExceededError,
+    WorkerNotRunningError,
+    WorkerRealTimeLimitExceededError,
+    WorkerStartError,
+)
+
+_MODULE_DIR = Path(__file__).parent
+_STATIC_DIR = _MODULE_DIR / "static"
+
+# The user on whose behalf all requests to the package are made.
+REQUEST_USER = RequestUser(["de", "en"])
+
+# Templates rendered by the route handlers and middlewares. They are loaded once when the web app is created.
+_PAGE_TEMPLATES = ("options.html.jinja2", "attempt.html.jinja2", "invalid_question_state.html.jinja2")
+
 
 async def _extract_manifest(app: web.Application) -> None:
-    webserver = app[SDK_WEBSERVER_APP_KEY]
-    worker: Worker
-    async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
-        app[MANIFEST_APP_KEY] = await worker.get_manifest()
+    await app[SDK_WEBSERVER_APP_KEY].load_manifest()
+
+
+def render_template(
+    template_name: str, request: web.Request, context: Mapping[str, Any], *, status: int = 200
+) -> web.Response:
+    """Renders one of the pre-loaded page templates."""
+    template = request.app[TEMPLATES_APP_KEY][template_name]
+    return web.Response(text=template.render(context), status=status, content_type="text/html")
 
 
 @web.middleware
@@ -41,10 +79,48 @@ async def _invalid_question_state_middleware(request: web.Request, handler: Hand
         return await handler(request)
     except InvalidQuestionStateError as e:
         question_state = webserver.read_state_file(StateFilename.QUESTION_STATE)
-        context = {"stacktrace": "".join(traceback.format_exception(e)), "manifest": request.app[MANIFEST_APP_KEY]}
+        context = {"stacktrace": "".join(traceback.format_exception(e)), "manifest": webserver.manifest}
         if question_state is not None:
             context["question_state"] = question_state
-        return aiohttp_jinja2.render_template("invalid_question_state.html.jinja2", request, context, status=500)
+        return render_template("invalid_question_state.html.jinja2", request, context, status=500)
+
+
+class _StaticFiles:
+    """Serves the static files of the web server from memory.
+
+    The files are part of the SDK and don't change while the server is running, so they are read only once.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        # Maps the path relative to `directory` to the file content, content type and ETag.
+        self._files: dict[str, tuple[bytes, str, str]] = {}
+        for path in directory.rglob("*"):
+            if path.is_file():
+                body = path.read_bytes()
+                content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+                etag = hashlib.sha256(body).hexdigest()[:16]
+                self._files[path.relative_to(directory).as_posix()] = (body, content_type, etag)
+
+    def url(self, filename: str) -> str:
+        """Returns the versioned URL of a static file."""
+        _, _, etag = self._files[filename]
+        return f"/static/{filename}?v={etag}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        try:
+            body, content_type, etag = self._files[request.match_info["filename"]]
+        except KeyError:
+            raise web.HTTPNotFound from None
+
+        headers = {"ETag": f'"{etag}"'}
+        if "v" in request.query:
+            # Versioned URLs change whenever the file content changes, so browsers may cache them indefinitely.
+            headers["Cache-Control"] = "public, max-age=31536000, immutable"
+
+        if_none_match = request.if_none_match
+        if if_none_match and any(tag.value in {etag, "*"} for tag in if_none_match):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type=content_type, headers=headers)
 
 
 class StateFilename(StrEnum):
@@ -55,7 +131,7 @@ class StateFilename(StrEnum):
     LAST_ATTEMPT_DATA = "last_attempt_data.json"
 
 
-DEFAULT_STATE_STORAGE_PATH = Path(__file__).parent / "question_state_storage"
+DEFAULT_STATE_STORAGE_PATH = _MODULE_DIR / "question_state_storage"
 
 
 class WebServer:
@@ -65,6 +141,7 @@ class WebServer:
         state_storage_path: Path,
         host: str = "localhost",
         port: int = 8080,
+        worker_pool_size: int = 1,
     ) -> None:
         self.package_location = package_location
         self._state_storage_root = state_storage_path
@@ -73,7 +150,20 @@ class WebServer:
 
         self._web_app: web.Application | None = None
         self._runner: web.AppRunner | None = None
-        self.worker_pool: WorkerPool = WorkerPool(1, 500 * MiB, worker_type=ThreadWorker)
+        self._manifest: Manifest | None = None
+        # Contents of the state files, `None` meaning the file doesn't exist. All state file access goes through this
+        # class, so the cache is kept up to date on writes instead of re-reading the files on every request.
+        self._state_file_cache: dict[StateFilename, str | None] = {}
+
+        # Workers are started on demand and kept running between requests. Each worker handles one request at a time,
+        # and at most `worker_pool_size` workers exist at once. Reloading the package starts a new worker generation.
+        # Thread workers share the interpreter, including `sys.modules` and thereby the module-level state of the
+        # package. Running more than one of them at once is only safe for packages without such state, so concurrency
+        # is opt-in.
+        self._worker_semaphore = asyncio.Semaphore(worker_pool_size)
+        self._idle_workers: list[ThreadWorker] = []
+        self._worker_generation = 0
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
 
     async def start_server(self) -> None:
         if self._web_app:
@@ -91,27 +181,121 @@ class WebServer:
             self._web_app = None
             self._runner = None
 
+        await self._stop_workers()
+
+    async def reload_package(self) -> None:
+        """Picks up changes to the package by replacing the workers, keeping the web app running.
+
+        Starts the server if it is not running yet.
+        """
+        if self._web_app is None:
+            await self.start_server()
+            return
+
+        await self._stop_workers()
+        await self.load_manifest()
+
     async def run_forever(self) -> None:
         await self.start_server()
         await asyncio.Event().wait()  # run forever
 
+    @asynccontextmanager
+    async def worker(self) -> AsyncIterator["Worker"]:
+        """Provides exclusive access to one of the package workers."""
+        async with self._worker_semaphore:
+            generation = self._worker_generation
+            worker = self._idle_workers.pop() if self._idle_workers else await self._start_worker()
+            discard = False
+            try:
+                yield worker
+            except _WORKER_FAILURES:
+                # Don't reuse a worker which might have been left in an inconsistent state.
+                discard = True
+                raise
+            finally:
+                if discard or generation != self._worker_generation:
+                    # The worker failed or the package was reloaded while the worker was in use.
+                    await worker.stop(_WORKER_STOP_TIMEOUT)
+                else:
+                    self._idle_workers.append(worker)
+
+    async def coalesce(self, key: Hashable, coro_factory: Callable[[], Awaitable[_T]]) -> _T:
+        """Runs the coroutine created by `coro_factory`, sharing its result with concurrent callers using the same key.
+
+        Args:
+            key: Identifies the operation and all of its inputs.
+            coro_factory: Creates the coroutine to run if no operation with the same key is in flight.
+
+        Returns:
+            The result of the (possibly shared) coroutine.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(coro_factory())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # Shielded, so that a cancelled caller doesn't cancel the operation for the others.
+        return await asyncio.shield(future)
+
+    async def load_manifest(self) -> None:
+        worker: Worker
+        async with self.worker() as worker:
+            self._manifest = await worker.get_manifest()
+        # The package state dir depends on the manifest.
+        self.__dict__.pop("_package_state_dir", None)
+        self._state_file_cache.clear()
+
+    @property
+    def manifest(self) -> Manifest:
+        if self._manifest is None:
+            msg = "Manifest not loaded"
+            raise RuntimeError(msg)
+        return self._manifest
+
     def read_state_file(self, filename: StateFilename) -> str | None:
+        if filename in self._state_file_cache:
+            return self._state_file_cache[filename]
+
         try:
-            return (self._package_state_dir / filename).read_text()
+            data = (self._package_state_dir / filename).read_text()
         except FileNotFoundError:
-            return None
+            data = None
+
+        self._state_file_cache[filename] = data
+        return data
 
     def write_state_file(self, filename: StateFilename, data: str) -> None:
-        self._package_state_dir.mkdir(parents=True, exist_ok=True)
-        (self._package_state_dir / filename).write_text(data)
+        path = self._package_state_dir / filename
+        try:
+            path.write_text(data)
+        except FileNotFoundError:
+            # Only create the package state dir when it is actually missing.
+            self._package_state_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(data)
+        self._state_file_cache[filename] = data
 
     def delete_state_files(self, filename_1: StateFilename, *filenames: StateFilename) -> None:
         for filename in (filename_1, *filenames):
             (self._package_state_dir / filename).unlink(missing_ok=True)
-        if not any(self._package_state_dir.iterdir()):
+            self._state_file_cache[filename] = None
+        with os.scandir(self._package_state_dir) as entries:
+            is_empty = next(entries, None) is None
+        if is_empty:
             # Remove package state dir if it's now empty.
             self._package_state_dir.rmdir()
 
+    async def _start_worker(self) -> ThreadWorker:
+        worker = ThreadWorker(self.package_location, None)
+        await worker.start()
+        return worker
+
+    async def _stop_workers(self) -> None:
+        """Stops all idle workers. Workers which are currently in use are stopped once they are released."""
+        self._worker_generation += 1
+        idle_workers, self._idle_workers = self._idle_workers, []
+        await asyncio.gather(*(worker.stop(_WORKER_STOP_TIMEOUT) for worker in idle_workers))
+
     def _create_webapp(self) -> web.Application:
         # We import here, so we don't have to work around circular imports.
         from questionpy_sdk.webserver.routes.attempt import routes as attempt_routes  # noqa: PLC0415
@@ -124,25 +308,31 @@ class WebServer:
         app.add_routes(attempt_routes)
         app.add_routes(options_routes)
         app.add_routes(worker_routes)
-        app.router.add_static("/static", Path(__file__).parent / "static")
+        static_files = _StaticFiles(_STATIC_DIR)
+        app.router.add_get("/static/{filename:.+}", static_files.handle, name="static")
 
         app.on_startup.append(_extract_manifest)
         app.middlewares.append(_invalid_question_state_middleware)
 
         jinja2_extensions = ["jinja2.ext.do"]
-        aiohttp_jinja2.setup(app, loader=PackageLoader(__package__), extensions=jinja2_extensions)
+        env = aiohttp_jinja2.setup(
+            app,
+            loader=PackageLoader(__package__),
+            extensions=jinja2_extensions,
+            # Templates are part of the SDK and don't change while the server is running.
+            auto_reload=False,
+            bytecode_cache=FileSystemBytecodeCache(),
+        )
+        env.globals["static_url"] = static_files.url
+        app[TEMPLATES_APP_KEY] = {name: env.get_template(name) for name in _PAGE_TEMPLATES}
 
         return app
 
     @cached_property
     def _package_state_dir(self) -> Path:
-        if self._web_app is None:
-            msg = "Web app not initialized"
-            raise RuntimeError(msg)
-
-        manifest = self._web_app[MANIFEST_APP_KEY]
+        manifest = self.manifest
         return self._state_storage_root / f"{manifest.namespace}-{manifest.short_name}-{manifest.version}"
 
 
 SDK_WEBSERVER_APP_KEY = web.AppKey("sdk_webserver_app", WebServer)
-MANIFEST_APP_KEY = web.AppKey("manifest", Manifest)
+TEMPLATES_APP_KEY = web.AppKey("templates", dict[str, Template])
@@ -1,7 +1,10 @@
 #  This file is part of the QuestionPy SDK. (https://questionpy.org)
 #  The QuestionPy SDK is free software released under terms of the MIT license. See LICENSE.md.
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
-from typing import Literal, TypedDict
+import asyncio
+import json
+from functools import lru_cache
+from typing import Literal, NotRequired, TypeAlias, TypedDict
 
 from questionpy_common.api.attempt import AttemptModel, AttemptScoredModel, AttemptStartedModel
 from questionpy_sdk.webserver.question_ui import (
@@ -9,11 +12,18 @@ from questionpy_sdk.webserver.question_ui import (
     QuestionFormulationUIRenderer,
     QuestionUIRenderer,
 )
-from questionpy_sdk.webserver.question_ui.errors import RenderErrorCollections, log_render_errors
+from questionpy_sdk.webserver.question_ui.errors import RenderErrorCollection, RenderErrorCollections, log_render_errors
+
+_AttemptStatus: TypeAlias = Literal["Started", "In progress", "Scored"]
+
+_ATTEMPT_STATUS: dict[type[AttemptModel], _AttemptStatus] = {
+    AttemptStartedModel: "Started",
+    AttemptScoredModel: "Scored",
+}
 
 
 class _AttemptRenderContext(TypedDict):
-    attempt_status: Literal["Started", "In progress", "Scored"]
+    attempt_status: _AttemptStatus
 
     attempt: AttemptModel
     attempt_state: str
@@ -22,14 +32,30 @@ class _AttemptRenderContext(TypedDict):
     form_disabled: bool
 
     formulation: str
-    general_feedback: str | None
-    specific_feedback: str | None
-    right_answer: str | None
+    # Only present if shown.
+    general_feedback: NotRequired[str]
+    specific_feedback: NotRequired[str]
+    right_answer: NotRequired[str]
 
     render_errors: RenderErrorCollections
 
 
-def get_attempt_render_context(
+@lru_cache(maxsize=32)
+def _render(
+    renderer_class: type[QuestionUIRenderer], xml: str, placeholders: str, options: str, seed: int, attempt: str
+) -> tuple[str, RenderErrorCollection]:
+    """Renders a part of the question UI.
+
+    Rendering is deterministic, so the arguments are passed in serialized form to reuse the result of previous renders,
+    e.g. when the attempt page is reloaded.
+    """
+    renderer = renderer_class(
+        xml, json.loads(placeholders), QuestionDisplayOptions.model_validate_json(options), seed, json.loads(attempt)
+    )
+    return renderer.render()
+
+
+async def get_attempt_render_context(
     attempt: AttemptModel,
     attempt_state: str,
     *,
@@ -38,46 +64,45 @@ def get_attempt_render_context(
     seed: int,
     disabled: bool,
 ) -> _AttemptRenderContext:
-    renderer_args = (attempt.ui.placeholders, display_options, seed, last_attempt_data)
+    renderer_args = (
+        json.dumps(attempt.ui.placeholders, sort_keys=True),
+        display_options.model_dump_json(),
+        seed,
+        json.dumps(last_attempt_data, sort_keys=True),
+    )
+
+    # The optional sections which are shown.
+    sections: list[tuple[str, Literal["general_feedback", "specific_feedback", "right_answer"]]] = []
+    if display_options.general_feedback and attempt.ui.general_feedback:
+        sections.append(("General Feedback", "general_feedback"))
+    if display_options.feedback and attempt.ui.specific_feedback:
+        sections.append(("Specific Feedback", "specific_feedback"))
+    if display_options.right_answer and attempt.ui.right_answer:
+        sections.append(("Right Answer", "right_answer"))
 
-    html, errors = QuestionFormulationUIRenderer(attempt.ui.formulation, *renderer_args).render()
+    # Render the sections in parallel and without blocking the event loop.
+    (formulation, formulation_errors), *rendered = await asyncio.gather(
+        asyncio.to_thread(_render, QuestionFormulationUIRenderer, attempt.ui.formulation, *renderer_args),
+        *(
+            asyncio.to_thread(_render, QuestionUIRenderer, getattr(attempt.ui, key), *renderer_args)
+            for _, key in sections
+        ),
+    )
 
     context: _AttemptRenderContext = {
-        "attempt_status": (
-            "Started"
-            if isinstance(attempt, AttemptStartedModel)
-            else "Scored"
-            if isinstance(attempt, AttemptScoredModel)
-            else "In progress"
-        ),
+        "attempt_status": _ATTEMPT_STATUS.get(type(attempt), "In progress"),
         "attempt_state": attempt_state,
-        "options": display_options.model_dump(include={"general_feedback", "feedback", "right_answer"}),
+        "options": display_options.feedback_options,
         "form_disabled": disabled,
-        "formulation": html,
+        "formulation": formulation,
         "attempt": attempt,
-        "general_feedback": None,
-        "specific_feedback": None,
-        "right_answer": None,
-        "render_errors": {},
+        "render_errors": {"Formulation": formulation_errors} if formulation_errors else {},
     }
 
-    if errors:
-        context["render_errors"]["Formulation"] = errors
-    if display_options.general_feedback and attempt.ui.general_feedback:
-        html, errors = QuestionUIRenderer(attempt.ui.general_feedback, *renderer_args).render()
-        context["general_feedback"] = html
-        if errors:
-            context["render_errors"]["General Feedback"] = errors
-    if display_options.feedback and attempt.ui.specific_feedback:
-        html, errors = QuestionUIRenderer(attempt.ui.specific_feedback, *renderer_args).render()
-        context["specific_feedback"] = html
-        if errors:
-            context["render_errors"]["Specific Feedback"] = errors
-    if display_options.right_answer and attempt.ui.right_answer:
-        html, errors = QuestionUIRenderer(attempt.ui.right_answer, *renderer_args).render()
-        context["right_answer"] = html
+    for (section, key), (html, errors) in zip(sections, rendered, strict=True):
+        context[key] = html
         if errors:
-            context["render_errors"]["Right Answer"] = errors
+            context["render_errors"][section] = errors
 
     log_render_errors(context["render_errors"])
 
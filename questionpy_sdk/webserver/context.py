@@ -50,7 +50,7 @@ def _contextualize_element(
     element: FormElement,
     form_data: dict[str, Any] | None,
     path: list[str],
-    context: dict[str, object] | None = None,
+    context: dict[str, str] | None = None,
 ) -> CxdFormElement:
     path.append(element.name)
     element_form_data = None
@@ -68,14 +68,14 @@ def _contextualize_element(
         if not element_form_data:
             for i in range(1, element.initial_repetitions + 1):
                 path.append(str(i))
-                element_list = _contextualize_element_list(element.elements, None, path, {"repno": i})
+                element_list = _contextualize_element_list(element.elements, None, path, {"repno": str(i)})
                 cxd_rep_element.cxd_elements.append(element_list)
                 path.pop()
             path.pop()
             return cxd_rep_element
         for i, repetition in enumerate(element_form_data, 1):
             path.append(str(i))
-            element_list = _contextualize_element_list(element.elements, repetition, path, {"repno": i})
+            element_list = _contextualize_element_list(element.elements, repetition, path, {"repno": str(i)})
             cxd_rep_element.cxd_elements.append(element_list)
             path.pop()
         path.pop()
@@ -88,7 +88,7 @@ def _contextualize_element(
     cxd_element_class = element_mapping[type(element)]
     cxd_element = cxd_element_class(**element.model_dump(), path=path)
     if context:
-        cxd_element.contextualize(r"\{\s?qpy:repno\s?\}", str(context.get("repno")))
+        cxd_element.contextualize(context)
     cxd_element.add_form_data_value(element_form_data)
 
     path.pop()
@@ -99,7 +99,7 @@ def _contextualize_element_list(
     element_list: list[FormElement],
     form_data: dict[str, Any] | None,
     path: list[str],
-    context: dict[str, object] | None = None,
+    context: dict[str, str] | None = None,
 ) -> list[CxdFormElement]:
     cxd_element_list: list[CxdFormElement] = []
     for element in element_list:
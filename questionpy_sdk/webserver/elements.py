@@ -2,10 +2,12 @@
 #  The QuestionPy SDK is free software released under terms of the MIT license. See LICENSE.md.
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 
-from re import Pattern, sub
+import re
+from collections.abc import Mapping
+from functools import cached_property, lru_cache
 from typing import Annotated, Any, TypeAlias
 
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, ConfigDict, Field, computed_field
 
 from questionpy_common.elements import (
     CheckboxElement,
@@ -23,24 +25,61 @@ from questionpy_common.elements import (
     TextInputElement,
 )
 
+_QPY_PATTERN = re.compile(r"(\{\s?qpy:(\w+)\s?\})")
+
+
+@lru_cache(maxsize=1024)
+def _split_qpy_patterns(text: str) -> tuple[str, ...]:
+    """Splits `text` into literal parts, each but the last followed by a QPy pattern and the pattern's identifier.
+
+    The result only depends on `text`, so repetitions of the same element share it regardless of their context.
+    """
+    return tuple(_QPY_PATTERN.split(text))
+
+
+def _substitute(text: str, context: Mapping[str, str]) -> str:
+    """Replaces all QPy patterns in `text` whose identifier is in `context`."""
+    if "{" not in text:
+        # Most texts don't contain any pattern.
+        return text
+
+    parts = _split_qpy_patterns(text)
+    chunks = [parts[0]]
+    for i in range(1, len(parts), 3):
+        pattern, identifier, literal = parts[i : i + 3]
+        chunks.extend((context.get(identifier, pattern), literal))
+    return "".join(chunks)
+
+
+def _selected_values(element_form_data: Any) -> set[str]:
+    """Returns the names or values selected in the form data of a checkbox group or select element."""
+    if isinstance(element_form_data, str):
+        # A single selected value.
+        return {element_form_data}
+    return set(element_form_data)
+
 
 class _CxdFormElement(BaseModel):
+    # The contextualized elements are only needed by the options form route, so don't build them on import.
+    model_config = ConfigDict(defer_build=True)
+
     path: list[str]
 
-    @computed_field
+    @computed_field  # type: ignore[prop-decorator]
+    @cached_property
     def id(self) -> str:
         return "_".join(self.path)
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
+    def contextualize(self, context: Mapping[str, str]) -> None:
         """Replaces patterns in model fields.
 
         QuestionPy form elements can contain a pattern in their model fields which is replaced with a value when the
-        OptionsForm is presented to add additional context for the user. Replaces the QPy pattern with the replacement
-        string in model fields which can contain such a pattern.
+        OptionsForm is presented to add additional context for the user. Replaces the QPy patterns with their values
+        in model fields which can contain such a pattern.
 
         Args:
-            pattern: The QPy Pattern to be replaced. A valid QPy Pattern matches `{qpy:<identifier>}` e.g. `{qpy:repno}`
-            replacement: The replacement string
+            context: Maps QPy pattern identifiers to their replacements. A valid QPy Pattern matches
+                `{qpy:<identifier>}` e.g. `{qpy:repno}`
         Returns:
             None
         """
@@ -59,12 +98,12 @@ class _CxdFormElement(BaseModel):
 class CxdTextInputElement(TextInputElement, _CxdFormElement):
     value: str | None = None
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
         if self.default:
-            self.default = sub(pattern, replacement, self.default)
+            self.default = _substitute(self.default, context)
         if self.placeholder:
-            self.placeholder = sub(pattern, replacement, self.placeholder)
+            self.placeholder = _substitute(self.placeholder, context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if element_form_data:
@@ -74,12 +113,12 @@ class CxdTextInputElement(TextInputElement, _CxdFormElement):
 class CxdTextAreaElement(TextAreaElement, _CxdFormElement):
     value: str | None = None
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
         if self.default:
-            self.default = sub(pattern, replacement, self.default)
+            self.default = _substitute(self.default, context)
         if self.placeholder:
-            self.placeholder = sub(pattern, replacement, self.placeholder)
+            self.placeholder = _substitute(self.placeholder, context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if element_form_data:
@@ -87,17 +126,17 @@ class CxdTextAreaElement(TextAreaElement, _CxdFormElement):
 
 
 class CxdStaticTextElement(StaticTextElement, _CxdFormElement):
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
-        self.text = sub(pattern, replacement, self.text)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
+        self.text = _substitute(self.text, context)
 
 
 class CxdCheckboxElement(CheckboxElement, _CxdFormElement):
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
+    def contextualize(self, context: Mapping[str, str]) -> None:
         if self.left_label:
-            self.left_label = sub(pattern, replacement, self.left_label)
+            self.left_label = _substitute(self.left_label, context)
         if self.right_label:
-            self.right_label = sub(pattern, replacement, self.right_label)
+            self.right_label = _substitute(self.right_label, context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if element_form_data:
@@ -105,56 +144,50 @@ class CxdCheckboxElement(CheckboxElement, _CxdFormElement):
 
 
 class CxdCheckboxGroupElement(CheckboxGroupElement, _CxdFormElement):
-    cxd_checkboxes: list[CxdCheckboxElement] = []
+    cxd_checkboxes: list[CxdCheckboxElement] = Field(default_factory=list)
 
     def __init__(self, **data: Any):
         super().__init__(**data)
-        for checkbox in self.checkboxes:
-            path = data.get("path")
-            if not isinstance(path, list):
-                msg = f"Path should be of type list but is {type(path)}"
-                raise TypeError(msg)
-            path.append(checkbox.name)
-            self.cxd_checkboxes.append(CxdCheckboxElement(**checkbox.model_dump(), path=path))
-            path.pop()
+        # The checkboxes have already been validated as part of this element.
+        self.cxd_checkboxes = [
+            CxdCheckboxElement.model_construct(**checkbox.__dict__, path=[*self.path, checkbox.name])
+            for checkbox in self.checkboxes
+        ]
         self.checkboxes = []
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
+    def contextualize(self, context: Mapping[str, str]) -> None:
         for cxd_checkbox in self.cxd_checkboxes:
-            cxd_checkbox.contextualize(pattern, replacement)
+            cxd_checkbox.contextualize(context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if not element_form_data:
             return
 
+        selected = _selected_values(element_form_data)
         for checkbox in self.cxd_checkboxes:
-            checkbox.selected = checkbox.name in element_form_data
+            checkbox.selected = checkbox.name in selected
 
 
 class CxdOption(Option, _CxdFormElement):
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
 
 
 class CxdRadioGroupElement(RadioGroupElement, _CxdFormElement):
-    cxd_options: list[CxdOption] = []
+    cxd_options: list[CxdOption] = Field(default_factory=list)
 
     def __init__(self, **data: Any):
         super().__init__(**data)
-        for option in self.options:
-            path = data.get("path")
-            if not isinstance(path, list):
-                msg = f"Path should be of type list but is {type(path)}"
-                raise TypeError(msg)
-            path.append(option.value)
-            self.cxd_options.append(CxdOption(**option.model_dump(), path=path))
-            path.pop()
+        # The options have already been validated as part of this element.
+        self.cxd_options = [
+            CxdOption.model_construct(**option.__dict__, path=[*self.path, option.value]) for option in self.options
+        ]
         self.options = []
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
         for cxd_option in self.cxd_options:
-            cxd_option.contextualize(pattern, replacement)
+            cxd_option.contextualize(context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if not element_form_data:
@@ -165,31 +198,28 @@ class CxdRadioGroupElement(RadioGroupElement, _CxdFormElement):
 
 
 class CxdSelectElement(SelectElement, _CxdFormElement):
-    cxd_options: list[CxdOption] = []
+    cxd_options: list[CxdOption] = Field(default_factory=list)
 
     def __init__(self, **data: Any):
         super().__init__(**data)
-        for option in self.options:
-            path = data.get("path")
-            if not isinstance(path, list):
-                msg = f"Path should be of type list but is {type(path)}"
-                raise TypeError(msg)
-            path.append(option.value)
-            self.cxd_options.append(CxdOption(**option.model_dump(), path=path))
-            path.pop()
+        # The options have already been validated as part of this element.
+        self.cxd_options = [
+            CxdOption.model_construct(**option.__dict__, path=[*self.path, option.value]) for option in self.options
+        ]
         self.options = []
 
-    def contextualize(self, pattern: Pattern[str], replacement: str) -> None:
-        self.label = sub(pattern, replacement, self.label)
+    def contextualize(self, context: Mapping[str, str]) -> None:
+        self.label = _substitute(self.label, context)
         for cxd_option in self.cxd_options:
-            cxd_option.contextualize(pattern, replacement)
+            cxd_option.contextualize(context)
 
     def add_form_data_value(self, element_form_data: Any) -> None:
         if not element_form_data:
             return
 
+        selected = _selected_values(element_form_data)
         for option in self.cxd_options:
-            option.selected = option.value in element_form_data
+            option.selected = option.value in selected
 
 
 class CxdHiddenElement(HiddenElement, _CxdFormElement):
@@ -228,11 +258,15 @@ CxdFormElement: TypeAlias = Annotated[
 
 
 class CxdFormSection(FormSection):
+    model_config = ConfigDict(defer_build=True)
+
     cxd_elements: list[CxdFormElement] = []
     """Elements contained in the section."""
 
 
 class CxdOptionsFormDefinition(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     general: list[CxdFormElement] = []
     """Elements to add to the main section, after the LMS' own elements."""
     sections: list[CxdFormSection] = []
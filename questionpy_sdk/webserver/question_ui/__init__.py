@@ -5,13 +5,14 @@ from __future__ import annotations
 
 import re
 from enum import StrEnum
+from functools import cache, lru_cache
 from random import Random
-from typing import Any
+from typing import TYPE_CHECKING, Any, Protocol, cast
 
 import lxml.html
 import lxml.html.clean
 from lxml import etree
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from questionpy_sdk.webserver.question_ui.errors import (
     ConversionError,
@@ -23,46 +24,87 @@ from questionpy_sdk.webserver.question_ui.errors import (
     XMLSyntaxError,
 )
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
-def _assert_element_list(query: Any) -> list[etree._Element]:
-    """Checks if the XPath query result is a list of Elements.
+_XHTML_NAMESPACE = "http://www.w3.org/1999/xhtml"
+_QPY_NAMESPACE = "http://questionpy.org/ns/question"
 
-    - If it is, returns the list.
-    - Otherwise, raises an error.
 
-    Args:
-        query: The result of an XPath query.
+class _ElementXPath(Protocol):
+    """A compiled XPath expression selecting nodes, which lxml always returns as a list."""
 
-    Returns:
-        list: The result of the XPath query.
+    def __call__(self, node: etree._Element | etree._ElementTree, /, **variables: Any) -> list[etree._Element]: ...
 
-    Raises:
-        TypeError: If the result is not a list.
-    """
-    if not isinstance(query, list):
-        msg = "XPath query result is not a list."
-        raise TypeError(msg)
 
-    return query
+def _xpath(path: str) -> _ElementXPath:
+    """Compiles an XPath expression which can use the `xhtml` and `qpy` namespace prefixes."""
+    return cast(_ElementXPath, etree.XPath(path, namespaces={"xhtml": _XHTML_NAMESPACE, "qpy": _QPY_NAMESPACE}))
+
+
+# Namespaced tag and attribute names, in the form used by lxml.
+_XHTML_PREFIX = f"{{{_XHTML_NAMESPACE}}}"
+_QPY_PREFIX = f"{{{_QPY_NAMESPACE}}}"
+
+_XHTML_INPUT = f"{_XHTML_PREFIX}input"
+_XHTML_BUTTON = f"{_XHTML_PREFIX}button"
+_XHTML_OPTION = f"{_XHTML_PREFIX}option"
+_XHTML_SELECT = f"{_XHTML_PREFIX}select"
+_XHTML_TEXTAREA = f"{_XHTML_PREFIX}textarea"
+_XHTML_INPUT_TAGS = (_XHTML_BUTTON, _XHTML_INPUT, _XHTML_SELECT, _XHTML_TEXTAREA)
+
+_QPY_FEEDBACK = f"{_QPY_PREFIX}feedback"
+_QPY_IF_ROLE = f"{_QPY_PREFIX}if-role"
+_QPY_SHUFFLE_CONTENTS = f"{_QPY_PREFIX}shuffle-contents"
+_QPY_CORRECT_RESPONSE = f"{_QPY_PREFIX}correct-response"
+_QPY_SHUFFLED_INDEX = f"{_QPY_PREFIX}shuffled-index"
+_QPY_FORMAT_FLOAT = f"{_QPY_PREFIX}format-float"
+
+# The XPath expressions are compiled once instead of on every render. Queries only filtering by tag use `iter()`.
+_XPATH_PLACEHOLDERS = _xpath("//processing-instruction('p')")
+_XPATH_FEEDBACK = _xpath("//*[@qpy:feedback]")
+_XPATH_IF_ROLE = _xpath("//*[@qpy:if-role]")
+_XPATH_SHUFFLE_CONTENTS = _xpath("//*[@qpy:shuffle-contents]")
 
+# Separates the roles in a `qpy:if-role` attribute.
+_ROLE_SEPARATOR = re.compile(r"[\s|]+")
 
-def _set_element_value(element: etree._Element, value: str, name: str, xpath: etree.XPathDocumentEvaluator) -> None:
+# Matches QPy-URLs to the static files of a package.
+_QPY_URL_PATTERN = re.compile(r"qpy://(static|static-private)/((?:[a-z_][a-z0-9_]{0,126}/){2})")
+
+
+# Validation attributes and the `data-qpy_X` and aria attributes which replace them.
+_PATTERN = ("pattern", "data-qpy_pattern", None)
+_REQUIRED = ("required", "data-qpy_required", "aria-required")
+_MINLENGTH = ("minlength", "data-qpy_minlength", None)
+_MAXLENGTH = ("maxlength", "data-qpy_maxlength", None)
+_MIN = ("min", "data-qpy_min", "aria-valuemin")
+_MAX = ("max", "data-qpy_max", "aria-valuemax")
+
+# The validation attributes which are softened, by element.
+_SOFTENED_ATTRIBUTES: dict[str, tuple[tuple[str, str, str | None], ...]] = {
+    _XHTML_INPUT: (_PATTERN, _REQUIRED, _MINLENGTH, _MAXLENGTH, _MIN, _MAX),
+    _XHTML_SELECT: (_REQUIRED,),
+    _XHTML_TEXTAREA: (_REQUIRED, _MINLENGTH, _MAXLENGTH),
+}
+
+
+def _set_element_value(element: etree._Element, value: str) -> None:
     """Sets value on user input element.
 
     Args:
         element: XHTML element to set value on.
         value: Value to set.
-        name: Element name.
-        xpath: XPath evaluator.
     """
-    type_attr = element.get("type", "text") if element.tag.endswith("}input") else etree.QName(element).localname
+    tag = element.tag
+    type_attr = element.get("type", "text") if tag == _XHTML_INPUT else tag.rpartition("}")[2]
 
     if type_attr in {"checkbox", "radio"}:
         if element.get("value") == value:
             element.set("checked", "checked")
     elif type_attr == "select":
         # Iterate over child <option> elements to set 'selected' attribute
-        for option in _assert_element_list(xpath(f".//xhtml:option[parent::xhtml:select[@name='{name}']]")):
+        for option in element.iterchildren(_XHTML_OPTION):
             opt_value = option.get("value") if option.get("value") is not None else option.text
             if opt_value == value:
                 option.set("selected", "selected")
@@ -74,29 +116,18 @@ def _set_element_value(element: etree._Element, value: str, name: str, xpath: et
 
 
 def _replace_shuffled_indices(element: etree._Element, index: int, error_collection: RenderErrorCollection) -> None:
-    for index_element in _assert_element_list(
-        element.xpath(".//qpy:shuffled-index", namespaces={"qpy": QuestionUIRenderer.QPY_NAMESPACE})
-    ):
+    for index_element in list(element.iterdescendants(_QPY_SHUFFLED_INDEX)):
         format_style = index_element.get("format", "123")
 
-        if format_style == "123":
-            index_str = str(index)
-        elif format_style == "abc":
-            index_str = _int_to_letter(index).lower()
-        elif format_style == "ABC":
-            index_str = _int_to_letter(index).upper()
-        elif format_style == "iii":
-            index_str = _int_to_roman(index).lower()
-        elif format_style == "III":
-            index_str = _int_to_roman(index).upper()
-        else:
+        format_index = _INDEX_FORMATS.get(format_style)
+        if format_index is None:
             error_collection.insert(InvalidAttributeValueError(index_element, "format", format_style))
             _remove_preserving_tail(index_element)
             continue
 
         # Replace the index element with the new index string
         new_text_node = etree.Element("span")  # Using span to replace the custom element
-        new_text_node.text = index_str
+        new_text_node.text = format_index(index)
 
         if index_element.tail:
             new_text_node.tail = index_element.tail
@@ -111,18 +142,41 @@ def _int_to_letter(index: int) -> str:
     return chr(ord("a") + index - 1)
 
 
+_ROMAN_NUMERALS = (
+    (1000, "M"),
+    (900, "CM"),
+    (500, "D"),
+    (400, "CD"),
+    (100, "C"),
+    (90, "XC"),
+    (50, "L"),
+    (40, "XL"),
+    (10, "X"),
+    (9, "IX"),
+    (5, "V"),
+    (4, "IV"),
+    (1, "I"),
+)
+
+
+@cache
 def _int_to_roman(index: int) -> str:
     """Converts an integer to its Roman numeral representation. Simplified version."""
-    val = [1000, 900, 500, 400, 100, 90, 50, 40, 10, 9, 5, 4, 1]
-    syb = ["M", "CM", "D", "CD", "C", "XC", "L", "XL", "X", "IX", "V", "IV", "I"]
-    roman_num = ""
-    i = 0
-    while index > 0:
-        for _ in range(index // val[i]):
-            roman_num += syb[i]
-            index -= val[i]
-        i += 1
-    return roman_num
+    roman_num = []
+    for value, numeral in _ROMAN_NUMERALS:
+        count, index = divmod(index, value)
+        roman_num.append(numeral * count)
+    return "".join(roman_num)
+
+
+# Functions formatting the index of a shuffled element, by the value of the `format` attribute.
+_INDEX_FORMATS: dict[str, Callable[[int], str]] = {
+    "123": str,
+    "abc": _int_to_letter,
+    "ABC": lambda index: _int_to_letter(index).upper(),
+    "iii": lambda index: _int_to_roman(index).lower(),
+    "III": _int_to_roman,
+}
 
 
 def _add_text_before(before: etree._Element, text: str) -> None:
@@ -158,11 +212,23 @@ def _remove_preserving_tail(node: etree._Element) -> None:
     _remove_element(node)
 
 
+@lru_cache(maxsize=128)
+def _clean_html(raw_value: str) -> str:
+    """Cleans the HTML of a placeholder value, returning it wrapped in a single parent element.
+
+    The same placeholder values are usually inserted into multiple parts of the question UI, and cleaning is much more
+    expensive than parsing the cleaned result again.
+    """
+    fragment = lxml.html.fragment_fromstring(raw_value, create_parent=True)
+    lxml.html.clean.clean(fragment)
+    return lxml.html.tostring(fragment, encoding="unicode")
+
+
 class QuestionMetadata:
     def __init__(self) -> None:
         self.correct_response: dict[str, str] = {}
         self.expected_data: dict[str, str] = {}
-        self.required_fields: list[str] = []
+        self.required_fields: set[str] = set()
 
 
 class QuestionDisplayRole(StrEnum):
@@ -173,6 +239,8 @@ class QuestionDisplayRole(StrEnum):
 
 
 class QuestionDisplayOptions(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     general_feedback: bool = True
     feedback: bool = True
     right_answer: bool = True
@@ -184,12 +252,17 @@ class QuestionDisplayOptions(BaseModel):
     }
     readonly: bool = False
 
+    @property
+    def feedback_options(self) -> dict[str, bool]:
+        """The options controlling which kinds of feedback are shown."""
+        return {"general_feedback": self.general_feedback, "feedback": self.feedback, "right_answer": self.right_answer}
+
 
 class QuestionUIRenderer:
     """General renderer for the question UI except for the formulation part."""
 
-    XHTML_NAMESPACE: str = "http://www.w3.org/1999/xhtml"
-    QPY_NAMESPACE: str = "http://questionpy.org/ns/question"
+    XHTML_NAMESPACE: str = _XHTML_NAMESPACE
+    QPY_NAMESPACE: str = _QPY_NAMESPACE
 
     def __init__(
         self,
@@ -202,17 +275,16 @@ class QuestionUIRenderer:
         xml = self._replace_qpy_urls(xml)
         self._errors = RenderErrorCollection()
 
+        # IDs are never looked up, so the parser doesn't need to collect them. Parsers are not shared, as the parts of
+        # the question UI may be rendered in different threads.
         try:
-            root = etree.fromstring(xml)
+            root = etree.fromstring(xml, parser=etree.XMLParser(collect_ids=False))
         except etree.XMLSyntaxError as error:
-            parser = etree.XMLParser(recover=True)
+            parser = etree.XMLParser(recover=True, collect_ids=False)
             root = etree.fromstring(xml, parser=parser)
             self._errors.insert(XMLSyntaxError(error=error))
 
         self._xml = etree.ElementTree(root)
-        self._xpath = etree.XPathDocumentEvaluator(self._xml)
-        self._xpath.register_namespace("xhtml", self.XHTML_NAMESPACE)
-        self._xpath.register_namespace("qpy", self.QPY_NAMESPACE)
         self._placeholders = placeholders
         self._options = options
         self._random = Random(seed)
@@ -229,22 +301,19 @@ class QuestionUIRenderer:
             self._resolve_placeholders()
             self._hide_unwanted_feedback()
             self._hide_if_role()
-            self._set_input_values_and_readonly()
-            self._soften_validation()
-            self._defuse_buttons()
+            self._transform_inputs()
             self._shuffle_contents()
-            self._add_styles()
             self._format_floats()
             # TODO: mangle_ids_and_names
             self._clean_up()
 
-            self._html = etree.tostring(self._xml, pretty_print=True, method="html").decode()
+            self._html = etree.tostring(self._xml, encoding="unicode", pretty_print=True, method="html")
 
         return self._html, self._errors
 
     def _replace_qpy_urls(self, xml: str) -> str:
         """Replace QPY-URLs to package files with SDK-URLs."""
-        return re.sub(r"qpy://(static|static-private)/((?:[a-z_][a-z0-9_]{0,126}/){2})", r"/worker/\2file/\1/", xml)
+        return _QPY_URL_PATTERN.sub(r"/worker/\2file/\1/", xml)
 
     def _validate_placeholder(self, p_instruction: etree._Element) -> tuple[str, str] | None:
         """Collects potential render errors for the placeholder PIs.
@@ -287,7 +356,7 @@ class QuestionUIRenderer:
         Since QPy transformations should not be applied to the content of the placeholders, this method should be called
         last.
         """
-        for p_instruction in _assert_element_list(self._xpath("//processing-instruction('p')")):
+        for p_instruction in _XPATH_PLACEHOLDERS(self._xml):
             data = self._validate_placeholder(p_instruction)
             if data is None:
                 _remove_element(p_instruction)
@@ -300,14 +369,16 @@ class QuestionUIRenderer:
                 # Treat the value as plain text.
                 _add_text_before(p_instruction, raw_value)
             else:
-                # html.clean works on different element classes than etree, so we need to use different parse functions.
-                # Since the HTML elements are subclasses of the etree elements though, we can reuse them without dumping
-                # and reparsing.
-
-                # It doesn't really matter what element we wrap the fragment with, as we'll unwrap it immediately.
-                fragment = lxml.html.fragment_fromstring(raw_value, create_parent=True)
-                if clean_option != "noclean":
-                    lxml.html.clean.clean(fragment)
+                # The value is parsed with lxml.html, as html.clean works on different element classes than etree. The
+                # HTML elements are subclasses of the etree elements, so they can be inserted into the tree directly.
+                # Cleaned values are cached as markup by _clean_html and reparsed here: cleaning is much more expensive
+                # than parsing, and the same placeholder values are inserted into several parts of the question UI.
+
+                if clean_option == "noclean":
+                    # It doesn't really matter what element we wrap the fragment with, as we'll unwrap it immediately.
+                    fragment = lxml.html.fragment_fromstring(raw_value, create_parent=True)
+                else:
+                    fragment = lxml.html.fragment_fromstring(_clean_html(raw_value))
                 if fragment.text is not None:
                     _add_text_before(p_instruction, fragment.text)
                 for child in fragment:
@@ -317,8 +388,8 @@ class QuestionUIRenderer:
 
     def _hide_unwanted_feedback(self) -> None:
         """Hides elements marked with `qpy:feedback` if the type of feedback is disabled in `options`."""
-        for element in _assert_element_list(self._xpath("//*[@qpy:feedback]")):
-            feedback_type = element.get(f"{{{self.QPY_NAMESPACE}}}feedback")
+        for element in _XPATH_FEEDBACK(self._xml):
+            feedback_type = element.get(_QPY_FEEDBACK)
 
             # Check conditions to remove the element
             if not (
@@ -339,10 +410,11 @@ class QuestionUIRenderer:
 
         Removes elements with `qpy:if-role` attributes if the user matches none of the roles.
         """
-        for element in _assert_element_list(self._xpath("//*[@qpy:if-role]")):
-            if attr := element.get(f"{{{self.QPY_NAMESPACE}}}if-role"):
-                allowed_roles = [role.upper() for role in re.split(r"[\s|]+", attr)]
-                expected = list(QuestionDisplayRole)
+        expected = list(QuestionDisplayRole)
+        roles = self._options.roles
+        for element in _XPATH_IF_ROLE(self._xml):
+            if attr := element.get(_QPY_IF_ROLE):
+                allowed_roles = [role.upper() for role in _ROLE_SEPARATOR.split(attr)]
                 if unexpected := [role for role in allowed_roles if role not in expected]:
                     error = InvalidAttributeValueError(
                         element=element,
@@ -354,77 +426,55 @@ class QuestionUIRenderer:
                     _remove_element(element)
                     continue
 
-                has_role = any(role in allowed_roles and role in self._options.roles for role in QuestionDisplayRole)
-
-                if not has_role and (parent := element.getparent()) is not None:
+                if roles.isdisjoint(allowed_roles) and (parent := element.getparent()) is not None:
                     parent.remove(element)
 
-    def _set_input_values_and_readonly(self) -> None:
-        """Transforms input(-like) elements.
+    def _transform_inputs(self) -> None:
+        """Applies all transformations of input(-like) elements in a single pass over them."""
+        for element in self._xml.iter(*_XHTML_INPUT_TAGS):
+            self._set_input_value_and_readonly(element)
+            self._soften_validation(element)
+            self._defuse_button(element)
+            self._add_styles(element)
+
+    def _set_input_value_and_readonly(self, element: etree._Element) -> None:
+        """Transforms an input(-like) element.
 
         - If `options` is set, the input is disabled.
         - If a value was saved for the input in a previous step, the latest value is added to the HTML.
 
         Requires the unmangled name of the element, so must be called `before` `mangle_ids_and_names`
         """
-        elements = _assert_element_list(
-            self._xpath("//xhtml:button | //xhtml:input | //xhtml:select | //xhtml:textarea")
-        )
-
-        for element in elements:
-            # Disable the element if options specify readonly
-            if self._options.readonly:
-                element.set("disabled", "disabled")
+        # Disable the element if options specify readonly
+        if self._options.readonly:
+            element.set("disabled", "disabled")
 
-            name = element.get("name")
-            if not name or not self._attempt:
-                continue
+        # Without previous answers, there are no values to restore.
+        if not self._attempt or not (name := element.get("name")):
+            return
 
-            last_value = self._attempt.get(name)
-            if last_value is not None:
-                _set_element_value(element, last_value, name, self._xpath)
+        last_value = self._attempt.get(name)
+        if last_value is not None:
+            _set_element_value(element, last_value)
 
-    def _soften_validation(self) -> None:
+    def _soften_validation(self, element: etree._Element) -> None:
         """Replaces HTML attributes so that submission is not prevented.
 
-        Removes attributes `pattern`, `required`, `minlength`, `maxlength`, `min`, `max` from elements, so form
+        Removes attributes `pattern`, `required`, `minlength`, `maxlength`, `min`, `max` from the element, so form
         submission is not affected. The standard attributes are replaced with `data-qpy_X`, which are then evaluated in
         JavaScript.
         """
-
-        def handle_attribute(
-            elements: list[str], attribute: str, data_attribute: str, aria_attribute: str | None = None
-        ) -> None:
-            xhtml_elems = " | ".join(f".//xhtml:{elem}" for elem in elements)
-            element_list = _assert_element_list(self._xpath(f"({xhtml_elems})[@{attribute}]"))
-            for element in element_list:
-                value = element.get(attribute)
-                element.attrib.pop(attribute)
-                if value:
-                    value = "true" if value == attribute else value
-                    element.set(data_attribute, value)
-                    if aria_attribute:
-                        element.set(aria_attribute, value)
-
-        # 'pattern' attribute for <input> elements
-        handle_attribute(["input"], "pattern", "data-qpy_pattern")
-
-        # 'required' attribute for <input>, <select>, <textarea> elements
-        handle_attribute(["input", "select", "textarea"], "required", "data-qpy_required", "aria-required")
-
-        # 'minlength'/'maxlength' attribute for <input>, <textarea> elements
-        handle_attribute(["input", "textarea"], "minlength", "data-qpy_minlength")
-        handle_attribute(["input", "textarea"], "maxlength", "data-qpy_maxlength")
-
-        # 'min'/'max' attributes for <input> elements
-        handle_attribute(["input"], "min", "data-qpy_min", "aria-valuemin")
-        handle_attribute(["input"], "max", "data-qpy_max", "aria-valuemax")
-
-    def _defuse_buttons(self) -> None:
+        for attribute, data_attribute, aria_attribute in _SOFTENED_ATTRIBUTES.get(element.tag, ()):
+            value = element.attrib.pop(attribute, None)
+            if value:
+                value = "true" if value == attribute else value
+                element.set(data_attribute, value)
+                if aria_attribute:
+                    element.set(aria_attribute, value)
+
+    def _defuse_button(self, element: etree._Element) -> None:
         """Turns submit and reset buttons into simple buttons without a default action."""
-        for element in _assert_element_list(
-            self._xpath("(//xhtml:input | //xhtml:button)[@type = 'submit' or @type = 'reset']")
-        ):
+        if element.tag in {_XHTML_INPUT, _XHTML_BUTTON} and element.get("type") in {"submit", "reset"}:
             element.set("type", "button")
 
     def _shuffle_contents(self) -> None:
@@ -432,12 +482,18 @@ class QuestionUIRenderer:
 
         Also replaces `qpy:shuffled-index` elements which are descendants of each child with the new index of the child.
         """
-        for element in _assert_element_list(self._xpath("//*[@qpy:shuffle-contents]")):
-            # Collect child elements to shuffle them
-            child_elements = [child for child in element if isinstance(child, etree._Element)]
-            self._random.shuffle(child_elements)
+        for element in _XPATH_SHUFFLE_CONTENTS(self._xml):
+            element.attrib.pop(_QPY_SHUFFLE_CONTENTS)
+
+            # Collect child elements to shuffle them, leaving comments and processing instructions in place
+            child_elements = list(element.iterchildren("*"))
+            if len(child_elements) <= 1:
+                # Nothing to shuffle, only the index needs to be replaced.
+                if child_elements:
+                    _replace_shuffled_indices(child_elements[0], 1, self._errors)
+                continue
 
-            element.attrib.pop(f"{{{self.QPY_NAMESPACE}}}shuffle-contents")
+            self._random.shuffle(child_elements)
 
             # Reinsert shuffled elements, preserving non-element nodes
             for i, child in enumerate(child_elements):
@@ -447,61 +503,53 @@ class QuestionUIRenderer:
 
     def _clean_up(self) -> None:
         """Removes remaining QuestionPy elements and attributes as well as comments and xmlns declarations."""
-        for element in _assert_element_list(self._xpath("//qpy:*")):
-            error = UnknownElementError(element=element)
-            self._errors.insert(error)
-            _remove_element(element)
-
-        # Remove attributes in the QuestionPy namespace
-        for element in _assert_element_list(self._xpath("//*")):
-            qpy_attributes = [attr for attr in element.attrib if attr.startswith(f"{{{self.QPY_NAMESPACE}}}")]  # type: ignore[arg-type]
-            for attr in qpy_attributes:
-                del element.attrib[attr]
-
-        # Remove comments
-        for comment in _assert_element_list(self._xpath("//comment()")):
-            _remove_element(comment)
-
-        # Remove namespaces from all elements. (QPy elements should all have been consumed previously anyhow.)
-        for element in _assert_element_list(self._xpath("//*")):
-            qname = etree.QName(element)
-            if qname.namespace == self.XHTML_NAMESPACE:
-                element.tag = qname.localname
+        # QPy elements should all have been consumed previously.
+        for element in self._xml.iter(f"{_QPY_PREFIX}*"):
+            self._errors.insert(UnknownElementError(element=element))
+
+        # Bulk removal is done by lxml. Processing instructions are left as they are.
+        etree.strip_elements(self._xml, etree.Comment, f"{_QPY_PREFIX}*", with_tail=True)
+        etree.strip_attributes(self._xml, f"{_QPY_PREFIX}*")
+
+        # Remove the XHTML namespace from the elements.
+        for element in self._xml.iter(f"{_XHTML_PREFIX}*"):
+            element.tag = element.tag[len(_XHTML_PREFIX) :]
 
         etree.cleanup_namespaces(self._xml, top_nsmap={None: self.XHTML_NAMESPACE})  # type: ignore[dict-item]
 
     def _add_class_names(self, element: etree._Element, *class_names: str) -> None:
         """Adds the given class names to the elements `class` attribute if not already present."""
-        existing_classes = element.get("class", "").split()
-        for class_name in class_names:
-            if class_name not in existing_classes:
-                existing_classes.append(class_name)
+        existing = element.get("class")
+        if not existing:
+            # The common case of an element without classes.
+            element.set("class", " ".join(class_names))
+            return
+
+        existing_classes = existing.split()
+        known_classes = set(existing_classes)
+        # Keep the order of the existing classes, appending the missing ones.
+        existing_classes.extend(class_name for class_name in class_names if class_name not in known_classes)
         element.set("class", " ".join(existing_classes))
 
-    def _add_styles(self) -> None:
-        """Adds CSS classes to various elements."""
-        # First group: input (not checkbox, radio, button, submit, reset), select, textarea
-        for element in _assert_element_list(
-            self._xpath("""
-                //xhtml:input[@type != 'checkbox' and @type != 'radio' and
-                              @type != 'button' and @type != 'submit' and @type != 'reset']
-                | //xhtml:select | //xhtml:textarea
-                """)
-        ):
-            self._add_class_names(element, "form-control", "qpy-input")
+    def _add_styles(self, element: etree._Element) -> None:
+        """Adds CSS classes to an input(-like) element."""
+        if element.tag == _XHTML_INPUT:
+            input_type = element.get("type")
+            if input_type is None:
+                # Inputs without an explicit type are left unstyled.
+                return
+            if input_type in {"checkbox", "radio"}:
+                self._add_class_names(element, "qpy-input")
+                return
+            is_button = input_type in {"button", "submit", "reset"}
+        else:
+            is_button = element.tag == _XHTML_BUTTON
 
-        # Second group: input (button, submit, reset), button
-        for element in _assert_element_list(
-            self._xpath("""
-                //xhtml:input[@type = 'button' or @type = 'submit' or @type = 'reset']
-                | //xhtml:button
-                """)
-        ):
+        if is_button:
             self._add_class_names(element, "btn", "btn-primary", "qpy-input")
-
-        # Third group: input (checkbox, radio)
-        for element in _assert_element_list(self._xpath("//xhtml:input[@type = 'checkbox' or @type = 'radio']")):
-            self._add_class_names(element, "qpy-input")
+        else:
+            # Any other input, select or textarea.
+            self._add_class_names(element, "form-control", "qpy-input")
 
     def _validate_format_float_element(self, element: etree._Element) -> tuple[float, int | None, str] | None:
         """Collects potential render errors for the `qpy:format-float` element.
@@ -565,10 +613,7 @@ class QuestionUIRenderer:
 
         Uses `format_float` and optionally adds thousands separators.
         """
-        thousands_sep = ","  # Placeholder for thousands separator
-        decimal_sep = "."  # Placeholder for decimal separator
-
-        for element in _assert_element_list(self._xpath("//qpy:format-float")):
+        for element in list(self._xml.iter(_QPY_FORMAT_FLOAT)):
             data = self._validate_format_float_element(element)
             if data is None:
                 _remove_element(element)
@@ -578,20 +623,14 @@ class QuestionUIRenderer:
 
             strip_zeroes = "strip-zeros" in element.attrib
 
-            formatted_str = f"{float_val:.{precision}f}" if precision is not None else str(float_val)
+            # Precision and thousands separators are both handled by the format spec.
+            format_spec = "," if thousands_sep_attr == "yes" else ""
+            if precision is not None:
+                format_spec += f".{precision}f"
+            formatted_str = format(float_val, format_spec)
 
-            if strip_zeroes:
-                formatted_str = formatted_str.rstrip("0").rstrip(decimal_sep) if "." in formatted_str else formatted_str
-
-            if thousands_sep_attr == "yes":
-                parts = formatted_str.split(decimal_sep)
-                integral_part = parts[0]
-                integral_part_with_sep = f"{int(integral_part):,}".replace(",", thousands_sep)
-
-                if len(parts) > 1:
-                    formatted_str = integral_part_with_sep + decimal_sep + parts[1]
-                else:
-                    formatted_str = integral_part_with_sep
+            if strip_zeroes and "." in formatted_str:
+                formatted_str = formatted_str.rstrip("0").rstrip(".")
 
             new_text = etree.Element("span")
             new_text.text = formatted_str
@@ -599,8 +638,7 @@ class QuestionUIRenderer:
 
             new_text.tail = element.tail
             if parent is not None:
-                parent.insert(parent.index(element), new_text)
-                parent.remove(element)
+                parent.replace(element, new_text)
 
 
 class QuestionFormulationUIRenderer(QuestionUIRenderer):
@@ -620,33 +658,23 @@ class QuestionFormulationUIRenderer(QuestionUIRenderer):
     def _get_metadata(self) -> QuestionMetadata:
         """Extracts metadata from the question UI."""
         question_metadata = QuestionMetadata()
-        namespaces: dict[str, str] = {"xhtml": self.XHTML_NAMESPACE, "qpy": self.QPY_NAMESPACE}
 
-        # Extract correct responses
-        for element in self._xml.findall(".//*[@qpy:correct-response]", namespaces=namespaces):
+        # Collect all metadata in a single pass over the tree.
+        for element in self._xml.getroot().iterdescendants(etree.Element):
             name = element.get("name")
             if not name:
                 continue
 
-            if element.tag.endswith("input") and element.get("type") == "radio":
-                value = element.get("value")
-            else:
-                value = element.get(f"{{{self.QPY_NAMESPACE}}}correct-response")
-
-            if not value:
-                continue
-
-            question_metadata.correct_response[name] = value
-
-        # Extract other metadata
-        for element_type in ["input", "select", "textarea", "button"]:
-            for element in self._xml.findall(f".//xhtml:{element_type}", namespaces=namespaces):
-                name = element.get("name")
-                if not name:
-                    continue
+            correct_response = element.get(_QPY_CORRECT_RESPONSE)
+            if correct_response is not None:
+                if element.tag == _XHTML_INPUT and element.get("type") == "radio":
+                    correct_response = element.get("value")
+                if correct_response:
+                    question_metadata.correct_response[name] = correct_response
 
+            if element.tag in _XHTML_INPUT_TAGS:
                 question_metadata.expected_data[name] = "Any"
                 if element.get("required") is not None:
-                    question_metadata.required_fields.append(name)
+                    question_metadata.required_fields.add(name)
 
         return question_metadata
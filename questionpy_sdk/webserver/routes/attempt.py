@@ -2,17 +2,15 @@
 #  The QuestionPy SDK is free software released under terms of the MIT license. See LICENSE.md.
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 
-import json
-import random
+import secrets
 from typing import TYPE_CHECKING, Any
 
-import aiohttp_jinja2
 from aiohttp import web
 from pydantic import TypeAdapter
+from pydantic_core import from_json, to_json
 
 from questionpy_common.api.attempt import AttemptScoredModel, ScoreModel
-from questionpy_common.environment import RequestUser
-from questionpy_sdk.webserver.app import SDK_WEBSERVER_APP_KEY, StateFilename
+from questionpy_sdk.webserver.app import REQUEST_USER, SDK_WEBSERVER_APP_KEY, StateFilename, render_template
 from questionpy_sdk.webserver.attempt import get_attempt_render_context
 from questionpy_sdk.webserver.question_ui import QuestionDisplayOptions
 
@@ -21,11 +19,14 @@ if TYPE_CHECKING:
 
 routes = web.RouteTableDef()
 
+# Dumps only the score fields of a scored attempt.
+_SCORE_ADAPTER = TypeAdapter(ScoreModel)
+
 
 def _set_display_options(
     response: web.Response, value: str, max_age: int | None = 3600, same_site: str | None = "Strict"
 ) -> None:
-    response.set_cookie(name="display_options", value=value, max_age=max_age, samesite=same_site)
+    response.set_cookie(name="display_options", value=value, max_age=max_age, httponly=True, samesite=same_site)
 
 
 @routes.get("/attempt")
@@ -42,12 +43,12 @@ async def get_attempt(request: web.Request) -> web.Response:
     if seed_str:
         seed = int(seed_str)
     else:
-        seed = random.randint(0, 1000)
+        seed = secrets.randbelow(1001)
         webserver.write_state_file(StateFilename.ATTEMPT_SEED, str(seed))
 
     attempt_state = webserver.read_state_file(StateFilename.ATTEMPT_STATE)
     score_json = webserver.read_state_file(StateFilename.SCORE)
-    last_attempt_data = json.loads(webserver.read_state_file(StateFilename.LAST_ATTEMPT_DATA) or "{}")
+    last_attempt_data = from_json(webserver.read_state_file(StateFilename.LAST_ATTEMPT_DATA) or "{}")
 
     score = None
     if score_json:
@@ -56,9 +57,9 @@ async def get_attempt(request: web.Request) -> web.Response:
     worker: Worker
     if attempt_state:
         # Display a previously started attempt.
-        async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
+        async with webserver.worker() as worker:
             attempt = await worker.get_attempt(
-                request_user=RequestUser(["de", "en"]),
+                request_user=REQUEST_USER,
                 question_state=question_state,
                 attempt_state=attempt_state,
                 scoring_state=score.scoring_state if score else None,
@@ -69,20 +70,19 @@ async def get_attempt(request: web.Request) -> web.Response:
             attempt = AttemptScoredModel(**attempt.model_dump(), **score.model_dump())
     else:
         # Start a new attempt.
-        async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
-            attempt = await worker.start_attempt(
-                request_user=RequestUser(["de", "en"]), question_state=question_state, variant=1
-            )
+        async with webserver.worker() as worker:
+            attempt = await worker.start_attempt(request_user=REQUEST_USER, question_state=question_state, variant=1)
 
         attempt_state = attempt.attempt_state
         webserver.write_state_file(StateFilename.ATTEMPT_STATE, attempt_state)
 
     if not score:
         # TODO: Allow manually set display options to override this.
-        display_options.readonly = False
-        display_options.general_feedback = display_options.feedback = display_options.right_answer = False
+        display_options = display_options.model_copy(
+            update={"readonly": False, "general_feedback": False, "feedback": False, "right_answer": False}
+        )
 
-    context = get_attempt_render_context(
+    context = await get_attempt_render_context(
         attempt,
         attempt_state,
         last_attempt_data=last_attempt_data,
@@ -91,7 +91,7 @@ async def get_attempt(request: web.Request) -> web.Response:
         disabled=score is not None,
     )
 
-    return aiohttp_jinja2.render_template("attempt.html.jinja2", request, context)
+    return render_template("attempt.html.jinja2", request, context)
 
 
 async def _score_attempt(request: web.Request, data: Any) -> web.Response:
@@ -103,7 +103,7 @@ async def _score_attempt(request: web.Request, data: Any) -> web.Response:
         raise web.HTTPFound("/")  # noqa: EM101
 
     display_options = QuestionDisplayOptions.model_validate_json(request.cookies.get("display_options", "{}"))
-    display_options.readonly = True
+    display_options = display_options.model_copy(update={"readonly": True})
 
     attempt_state = webserver.read_state_file(StateFilename.ATTEMPT_STATE)
     if not attempt_state:
@@ -113,16 +113,16 @@ async def _score_attempt(request: web.Request, data: Any) -> web.Response:
     score = ScoreModel.model_validate_json(score_json) if score_json else None
 
     worker: Worker
-    async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
+    async with webserver.worker() as worker:
         attempt_scored = await worker.score_attempt(
-            request_user=RequestUser(["de", "en"]),
+            request_user=REQUEST_USER,
             question_state=question_state,
             attempt_state=attempt_state,
             response=data,
             scoring_state=score.scoring_state if score else None,
         )
 
-    webserver.write_state_file(StateFilename.SCORE, TypeAdapter(ScoreModel).dump_json(attempt_scored).decode())
+    webserver.write_state_file(StateFilename.SCORE, _SCORE_ADAPTER.dump_json(attempt_scored).decode())
 
     response = web.Response()
     _set_display_options(response, display_options.model_dump_json())
@@ -133,10 +133,10 @@ async def _score_attempt(request: web.Request, data: Any) -> web.Response:
 async def submit_attempt(request: web.Request) -> web.Response:
     webserver = request.app[SDK_WEBSERVER_APP_KEY]
 
-    data = await request.json()
+    data = await request.json(loads=from_json)
     response = await _score_attempt(request, data)
 
-    webserver.write_state_file(StateFilename.LAST_ATTEMPT_DATA, json.dumps(data))
+    webserver.write_state_file(StateFilename.LAST_ATTEMPT_DATA, to_json(data).decode())
     return response
 
 
@@ -144,14 +144,14 @@ async def submit_attempt(request: web.Request) -> web.Response:
 async def rescore_attempt(request: web.Request) -> web.Response:
     webserver = request.app[SDK_WEBSERVER_APP_KEY]
     data_json = webserver.read_state_file(StateFilename.LAST_ATTEMPT_DATA)
-    data = json.loads(data_json) if data_json else None
+    data = from_json(data_json) if data_json else None
     return await _score_attempt(request, data)
 
 
 @routes.post("/attempt/display-options")
 async def submit_display_options(request: web.Request) -> web.Response:
-    data = await request.json()
-    display_options_dict = json.loads(request.cookies.get("display_options", "{}"))
+    data = await request.json(loads=from_json)
+    display_options_dict = from_json(request.cookies.get("display_options", "{}"))
     display_options_dict.update(data)
     display_options = QuestionDisplayOptions.model_validate(display_options_dict)
 
@@ -178,6 +178,8 @@ async def edit_last_attempt(request: web.Request) -> web.Response:
 
 @routes.post("/attempt/save")
 async def save_attempt(request: web.Request) -> web.Response:
-    last_attempt_data = await request.json()
-    request.app[SDK_WEBSERVER_APP_KEY].write_state_file(StateFilename.LAST_ATTEMPT_DATA, json.dumps(last_attempt_data))
+    last_attempt_data = await request.json(loads=from_json)
+    request.app[SDK_WEBSERVER_APP_KEY].write_state_file(
+        StateFilename.LAST_ATTEMPT_DATA, to_json(last_attempt_data).decode()
+    )
     return web.Response()
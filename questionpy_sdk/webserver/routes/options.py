@@ -3,12 +3,11 @@
 #  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
 from typing import TYPE_CHECKING, Never
 
-import aiohttp_jinja2
 from aiohttp import web
 
-from questionpy_common.environment import RequestUser
+from questionpy_common.elements import OptionsFormDefinition
 from questionpy_sdk.webserver._form_data import get_nested_form_data, parse_form_data
-from questionpy_sdk.webserver.app import SDK_WEBSERVER_APP_KEY, StateFilename, WebServer
+from questionpy_sdk.webserver.app import REQUEST_USER, SDK_WEBSERVER_APP_KEY, StateFilename, WebServer, render_template
 from questionpy_sdk.webserver.context import contextualize
 
 if TYPE_CHECKING:
@@ -23,24 +22,27 @@ async def render_options(request: web.Request) -> web.Response:
     webserver = request.app[SDK_WEBSERVER_APP_KEY]
     question_state = webserver.read_state_file(StateFilename.QUESTION_STATE)
 
-    worker: Worker
-    async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
-        manifest = await worker.get_manifest()
-        form_definition, form_data = await worker.get_options_form(RequestUser(["de", "en"]), question_state)
+    async def get_options_form() -> tuple[OptionsFormDefinition, dict[str, object]]:
+        worker: Worker
+        async with webserver.worker() as worker:
+            return await worker.get_options_form(REQUEST_USER, question_state)
+
+    # Concurrent requests for the same question state are answered by a single worker call.
+    form_definition, form_data = await webserver.coalesce(("options_form", question_state), get_options_form)
 
     context = {
-        "manifest": manifest,
+        "manifest": webserver.manifest,
         "options": contextualize(form_definition=form_definition, form_data=form_data).model_dump(),
     }
 
-    return aiohttp_jinja2.render_template("options.html.jinja2", request, context)
+    return render_template("options.html.jinja2", request, context)
 
 
 async def _save_updated_form_data(form_data: dict, webserver: "WebServer") -> None:
     old_state = webserver.read_state_file(StateFilename.QUESTION_STATE)
     worker: Worker
-    async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
-        question = await worker.create_question_from_options(RequestUser(["de", "en"]), old_state, form_data=form_data)
+    async with webserver.worker() as worker:
+        question = await worker.create_question_from_options(REQUEST_USER, old_state, form_data=form_data)
 
     webserver.write_state_file(StateFilename.QUESTION_STATE, question.question_state)
 
@@ -21,12 +21,11 @@ async def get_static_file(request: web.Request) -> web.Response:
     short_name = request.match_info["short_name"]
     path = request.match_info["path"]
 
-    worker: Worker
-    async with webserver.worker_pool.get_worker(webserver.package_location, 0, None) as worker:
-        manifest = await worker.get_manifest()
-        if manifest.namespace != namespace or manifest.short_name != short_name:
-            return web.HTTPNotFound(reason="Package not found.")
+    if webserver.manifest.namespace != namespace or webserver.manifest.short_name != short_name:
+        return web.HTTPNotFound(reason="Package not found.")
 
+    worker: Worker
+    async with webserver.worker() as worker:
         try:
             file = await worker.get_static_file(path)
         except FileNotFoundError:
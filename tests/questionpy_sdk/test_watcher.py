@@ -50,6 +50,7 @@ def event_handler() -> _EventHandler:
         FileModifiedEvent(src_path=str(some_path)),
         FileModifiedEvent(src_path=str(some_path / "python" / "foo" / "bar" / "module.py")),
         FileMovedEvent(src_path=str(some_path / DIST_DIR / "foo"), dest_path=str(some_path / "foo")),
+        FileMovedEvent(src_path=str(some_path / "foo.py.swp"), dest_path=str(some_path / "foo.py")),
     ],
 )
 def test_should_not_ignore_events(event: FileSystemEvent, event_handler: _EventHandler) -> None:
@@ -70,6 +71,10 @@ def test_should_not_ignore_events(event: FileSystemEvent, event_handler: _EventH
         FileModifiedEvent(src_path=str(some_path / DIST_DIR)),
         FileMovedEvent(src_path=str(some_path / "foo"), dest_path=str(some_path / DIST_DIR / "foo")),
         FileOpenedEvent(src_path=str(some_path / "foo")),
+        FileModifiedEvent(src_path=str(some_path / "python" / "foo" / "bar" / ".module.py.swp")),
+        FileCreatedEvent(src_path=str(some_path / "python" / "foo" / "bar" / "__pycache__" / "module.cpython-311.pyc")),
+        FileModifiedEvent(src_path=str(some_path / ".git" / "index")),
+        FileMovedEvent(src_path=str(some_path / "foo.py"), dest_path=str(some_path / "foo.py~")),
     ],
 )
 def test_should_ignore_events(event: FileSystemEvent, event_handler: _EventHandler) -> None:
@@ -0,0 +1,236 @@
+#  This file is part of the QuestionPy SDK. (https://questionpy.org)
+#  The QuestionPy SDK is free software released under terms of the MIT license. See LICENSE.md.
+#  (c) Technische Universität Berlin, innoCampus <info@isis.tu-berlin.de>
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import cast
+from unittest.mock import AsyncMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+
+from questionpy_sdk.webserver.app import WebServer, _StaticFiles
+from questionpy_server.worker.exception import WorkerNotRunningError
+from questionpy_server.worker.runtime.package_location import PackageLocation
+
+
+class _FakeWorker:
+    def __init__(self) -> None:
+        self.stopped = False
+
+    async def stop(self, timeout: float) -> None:
+        self.stopped = True
+
+
+@pytest.fixture
+def webserver(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> WebServer:
+    webserver = WebServer(cast(PackageLocation, None), tmp_path, worker_pool_size=2)
+
+    monkeypatch.setattr(webserver, "_start_worker", AsyncMock(side_effect=_FakeWorker))
+    monkeypatch.setattr(webserver, "load_manifest", AsyncMock())
+    return webserver
+
+
+async def test_worker_is_reused(webserver: WebServer) -> None:
+    async with webserver.worker() as first_worker:
+        pass
+    async with webserver.worker() as second_worker:
+        pass
+
+    assert second_worker is first_worker
+    assert not cast(_FakeWorker, first_worker).stopped
+
+
+async def test_worker_is_reused_after_package_error(webserver: WebServer) -> None:
+    error = ValueError("invalid options")
+    with pytest.raises(ValueError, match="invalid options"):
+        async with webserver.worker() as first_worker:
+            raise error
+
+    async with webserver.worker() as second_worker:
+        pass
+
+    assert second_worker is first_worker
+    assert not cast(_FakeWorker, first_worker).stopped
+
+
+async def test_worker_is_discarded_after_worker_failure(webserver: WebServer) -> None:
+    with pytest.raises(WorkerNotRunningError):
+        async with webserver.worker() as first_worker:
+            raise WorkerNotRunningError
+
+    async with webserver.worker() as second_worker:
+        pass
+
+    assert second_worker is not first_worker
+    assert cast(_FakeWorker, first_worker).stopped
+
+
+async def test_worker_is_stopped_on_release_after_reload(webserver: WebServer) -> None:
+    # Pretend the server is running, so the package is reloaded instead of the server being started.
+    webserver._web_app = web.Application()
+
+    async with webserver.worker() as busy_worker:
+        async with webserver.worker() as idle_worker:
+            pass
+
+        await webserver.reload_package()
+        # Idle workers are stopped right away, the busy worker only once it is released.
+        assert cast(_FakeWorker, idle_worker).stopped
+        assert not cast(_FakeWorker, busy_worker).stopped
+
+    assert cast(_FakeWorker, busy_worker).stopped
+
+    async with webserver.worker() as new_worker:
+        pass
+
+    assert new_worker is not busy_worker
+
+
+class _Operation:
+    """Counts its executions and only finishes once released."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return self.calls
+
+
+async def test_coalesce_shares_execution_for_same_key(webserver: WebServer) -> None:
+    operation = _Operation()
+    callers = [asyncio.create_task(webserver.coalesce("key", operation)) for _ in range(3)]
+    await asyncio.sleep(0)
+    operation.release.set()
+
+    assert await asyncio.gather(*callers) == [1, 1, 1]
+    assert operation.calls == 1
+
+
+async def test_coalesce_runs_separately_for_different_keys(webserver: WebServer) -> None:
+    operation = _Operation()
+    operation.release.set()
+
+    results = await asyncio.gather(webserver.coalesce("key1", operation), webserver.coalesce("key2", operation))
+
+    assert sorted(results) == [1, 2]
+    assert operation.calls == 2
+
+
+async def test_coalesce_cancelled_caller_does_not_cancel_others(webserver: WebServer) -> None:
+    operation = _Operation()
+    cancelled_caller = asyncio.create_task(webserver.coalesce("key", operation))
+    other_caller = asyncio.create_task(webserver.coalesce("key", operation))
+    await asyncio.sleep(0)
+
+    cancelled_caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled_caller
+
+    operation.release.set()
+    assert await other_caller == 1
+    assert operation.calls == 1
+
+
+async def test_coalesce_forgets_key_after_completion(webserver: WebServer) -> None:
+    operation = _Operation()
+    operation.release.set()
+
+    assert await webserver.coalesce("key", operation) == 1
+    await asyncio.sleep(0)
+    assert "key" not in webserver._in_flight
+
+    # The operation is run again on the next call.
+    assert await webserver.coalesce("key", operation) == 2
+
+
+async def test_coalesce_forgets_key_after_exception(webserver: WebServer) -> None:
+    async def fail() -> None:
+        await asyncio.sleep(0)
+        msg = "failed"
+        raise RuntimeError(msg)
+
+    with pytest.raises(RuntimeError, match="failed"):
+        await webserver.coalesce("key", fail)
+    await asyncio.sleep(0)
+
+    assert "key" not in webserver._in_flight
+
+
+@pytest.fixture
+async def static_client(
+    tmp_path: Path, aiohttp_client: Callable[[web.Application], Awaitable[TestClient]]
+) -> tuple[TestClient, _StaticFiles]:
+    static_dir = tmp_path / "static"
+    (static_dir / "css").mkdir(parents=True)
+    (static_dir / "script.js").write_text("console.log('hello');")
+    (static_dir / "css" / "styles.css").write_text("body {}")
+    # Must not be reachable through the static route.
+    (tmp_path / "secret.txt").write_text("secret")
+
+    static_files = _StaticFiles(static_dir)
+    app = web.Application()
+    app.router.add_get("/static/{filename:.+}", static_files.handle)
+    return await aiohttp_client(app), static_files
+
+
+async def test_static_file_is_served_with_etag(static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, _ = static_client
+    response = await client.get("/static/css/styles.css")
+
+    assert response.status == 200
+    assert response.content_type == "text/css"
+    assert await response.text() == "body {}"
+    assert response.headers["ETag"]
+
+
+async def test_static_file_is_not_modified_on_matching_etag(static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, _ = static_client
+    etag = (await client.get("/static/script.js")).headers["ETag"]
+
+    response = await client.get("/static/script.js", headers={"If-None-Match": etag})
+
+    assert response.status == 304
+    assert response.headers["ETag"] == etag
+    assert await response.read() == b""
+
+
+async def test_static_file_is_served_on_other_etag(static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, _ = static_client
+    response = await client.get("/static/script.js", headers={"If-None-Match": '"outdated"'})
+
+    assert response.status == 200
+    assert await response.text() == "console.log('hello');"
+
+
+@pytest.mark.parametrize("path", ["/static/unknown.js", "/static/..%2Fsecret.txt", "/static/css/..%2F..%2Fsecret.txt"])
+async def test_static_file_not_found(path: str, static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, _ = static_client
+    response = await client.get(path)
+
+    assert response.status == 404
+
+
+async def test_versioned_static_file_is_immutable(static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, static_files = static_client
+    url = static_files.url("script.js")
+    assert url.startswith("/static/script.js?v=")
+
+    response = await client.get(url)
+
+    assert response.status == 200
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+async def test_unversioned_static_file_is_not_immutable(static_client: tuple[TestClient, _StaticFiles]) -> None:
+    client, _ = static_client
+    response = await client.get("/static/script.js")
+
+    assert response.status == 200
+    assert "Cache-Control" not in response.headers
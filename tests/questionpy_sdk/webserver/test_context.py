@@ -164,3 +164,34 @@ def test_contextualize_should_not_replace_outside_repetition(form_elements_fixtu
     # the "qpy:repno" identifier should still be in the model fields
     for element in cxd_form.general:
         assert _substring_in_cxd_element(element, "qpy:repno")
+
+
+@pytest.mark.parametrize("selected", ["opt10", ["opt10"]])
+def test_contextualize_should_only_select_exact_values(selected: str | list[str]) -> None:
+    form_definition = OptionsFormDefinition(
+        general=[
+            SelectElement(
+                name="select",
+                label="Select",
+                multiple=True,
+                options=[Option(label="Option 1", value="opt1"), Option(label="Option 10", value="opt10")],
+            ),
+            CheckboxGroupElement(
+                name="chk_group",
+                checkboxes=[
+                    CheckboxElement(name="opt1", right_label="Option 1"),
+                    CheckboxElement(name="opt10", right_label="Option 10"),
+                ],
+            ),
+        ],
+        sections=[],
+    )
+    cxd_form = contextualize(form_definition, form_data={"select": selected, "chk_group": selected})
+
+    cxd_select, cxd_chk_group = cxd_form.general
+    assert isinstance(cxd_select, CxdSelectElement)
+    assert isinstance(cxd_chk_group, CxdCheckboxGroupElement)
+
+    # "opt10" contains "opt1", which must not be selected as well.
+    assert [option.selected for option in cxd_select.cxd_options] == [False, True]
+    assert [checkbox.selected for checkbox in cxd_chk_group.cxd_checkboxes] == [False, True]
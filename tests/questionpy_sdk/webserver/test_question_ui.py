@@ -77,7 +77,7 @@ def test_should_extract_correct_metadata(xml_content: str) -> None:
         "only_lowercase_letters": "Any",
         "between_5_and_10_chars": "Any",
     }
-    expected_metadata.required_fields = ["my_number"]
+    expected_metadata.required_fields = {"my_number"}
 
     assert question_metadata.correct_response == expected_metadata.correct_response
     assert question_metadata.expected_data == expected_metadata.expected_data
@@ -284,6 +284,44 @@ def test_should_format_floats_in_en(renderer: QuestionUIRenderer) -> None:
     assert_html_is_equal(html, expected)
 
 
+@pytest.mark.render_params(
+    xml="""
+        <div xmlns="http://www.w3.org/1999/xhtml" xmlns:qpy="http://questionpy.org/ns/question">
+            Round across sep: <qpy:format-float precision="2" thousands-separator="yes">999.999</qpy:format-float>
+            Exponent: <qpy:format-float>1e3</qpy:format-float>
+            Exponent with thousands sep: <qpy:format-float thousands-separator="yes">1e6</qpy:format-float>
+            Large exponent: <qpy:format-float precision="1" thousands-separator="yes">1e20</qpy:format-float>
+        </div>
+    """
+)
+def test_should_format_float_edge_cases(renderer: QuestionUIRenderer) -> None:
+    expected = """
+        <div>
+            Round across sep: <span>1,000.00</span>
+            Exponent: <span>1000.0</span>
+            Exponent with thousands sep: <span>1,000,000.0</span>
+            Large exponent: <span>100,000,000,000,000,000,000.0</span>
+        </div>
+    """
+    html, errors = renderer.render()
+    assert len(errors) == 0
+    assert_html_is_equal(html, expected)
+
+
+@pytest.mark.render_params(
+    xml="""
+        <div xmlns="http://www.w3.org/1999/xhtml" xmlns:qpy="http://questionpy.org/ns/question">
+            Negative: <qpy:format-float precision="2" thousands-separator="yes">-1234.5</qpy:format-float>
+        </div>
+    """
+)
+def test_should_not_format_negative_floats(renderer: QuestionUIRenderer) -> None:
+    html, errors = renderer.render()
+    assert_html_is_equal(html, "<div>Negative: </div>")
+    assert len(errors) == 1
+    assert isinstance(next(iter(errors)), ConversionError)
+
+
 @pytest.mark.ui_file("shuffle")
 @pytest.mark.render_params(seed=42)
 def test_should_shuffle_the_same_way_in_same_attempt(renderer: QuestionUIRenderer, xml_content: str) -> None:
@@ -294,6 +332,28 @@ def test_should_shuffle_the_same_way_in_same_attempt(renderer: QuestionUIRendere
         assert html == expected_html, "Shuffled order should remain consistent across renderings with the same seed"
 
 
+@pytest.mark.render_params(
+    xml="""
+        <div xmlns="http://www.w3.org/1999/xhtml" xmlns:qpy="http://questionpy.org/ns/question">
+            <ol qpy:shuffle-contents=""><li>A</li><!-- comment --><li>B</li><?marker?><li>C</li></ol>
+            <p qpy:shuffle-contents=""><span>Only <qpy:shuffled-index format="ABC"/></span></p>
+        </div>
+    """,
+    seed=42,
+)
+def test_should_only_shuffle_child_elements(renderer: QuestionUIRenderer) -> None:
+    # Comments and processing instructions are not shuffled, the shuffled elements are appended after them.
+    expected = """
+        <div>
+            <ol><?marker><li>B</li><li>A</li><li>C</li></ol>
+            <p><span>Only <span>A</span></span></p>
+        </div>
+    """
+    html, errors = renderer.render()
+    assert len(errors) == 0
+    assert_html_is_equal(html, expected)
+
+
 @pytest.mark.ui_file("shuffled-index")
 @pytest.mark.render_params(seed=42)
 def test_should_replace_shuffled_index(renderer: QuestionUIRenderer) -> None: